@@ -4,92 +4,104 @@ Bank Statement Parser using LangChain for structured output
 
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, TypeAdapter, ValidationInfo, field_validator
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
 from langchain.schema import BaseOutputParser
-import csv
-import io
+import functools
 import json
 from decimal import Decimal
 import logging
 import re
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from keyword_matcher import KeywordMatcher
+from parser_utils import csv_amount, csv_field, extract_json
+
 logger = logging.getLogger(__name__)
 
+# Category mapping with more specific keywords (earlier categories win)
+_CATEGORY_KEYWORDS = {
+    'Groceries': ['grocery', 'food', 'market', 'supermarket', 'walmart'],
+    'Transportation': ['gas station', 'fuel', 'petrol', 'uber', 'lyft', 'taxi', 'parking'],
+    'Dining': ['restaurant', 'cafe', 'coffee', 'dining', 'pizza', 'food'],
+    'Shopping': ['amazon', 'online shop', 'ebay', 'store', 'purchase'],
+    'Utilities': ['utility', 'electric', 'water bill', 'gas bill', 'internet', 'phone'],
+    'Housing': ['rent', 'mortgage', 'lease'],
+    'Income': ['salary', 'payroll', 'wage', 'deposit', 'direct deposit'],
+    'Transfer': ['transfer', 'payment', 'zelle', 'venmo', 'atm'],
+    'Healthcare': ['pharmacy', 'doctor', 'medical', 'hospital'],
+    'Entertainment': ['movie', 'netflix', 'spotify', 'game'],
+    'Banking': ['service fee', 'bank fee', 'overdraft', 'interest']
+}
+_INCOME_KEYWORDS = ('salary', 'payroll', 'wage', 'deposit')
+_INCOME_RE = re.compile('|'.join(map(re.escape, _INCOME_KEYWORDS)))
+
+# Compiled once at import so categorization is one scan per description
+_CATEGORY_MATCHER = KeywordMatcher(_CATEGORY_KEYWORDS.items())
+
+# Patterns used on every line of the table parser
+_DATE_RE = re.compile(r'\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}')
+_AMOUNT_RE = re.compile(r'[-+]?\$?\d+[,.]?\d*')
+_SPLIT_RE = re.compile(r'\s{2,}|\t|\|')
+
+# Drops currency symbols and thousands separators in one pass
+_MONEY_STRIP = str.maketrans('', '', '$,')
+
+# Common date formats, tried in order
+_DATE_FORMATS = (
+    "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d",
+    "%m-%d-%Y", "%d-%m-%Y", "%Y/%m/%d",
+    "%m/%d/%y", "%d/%m/%y"
+)
+
 
 class BankTransaction(BaseModel):
     """Model for a single bank transaction"""
     date: str = Field(description="Transaction date in MM/DD/YYYY or DD/MM/YYYY format")
     description: str = Field(description="Transaction description or merchant name")
-    category: Optional[str] = Field(default=None, description="Transaction category")
+    category: Optional[str] = Field(default=None, description="Transaction category", validate_default=True)
     debit: Optional[float] = Field(default=0.0, description="Debit amount (positive number)")
     credit: Optional[float] = Field(default=0.0, description="Credit amount (positive number)")
     balance: Optional[float] = Field(default=0.0, description="Account balance after transaction")
     
-    @validator('debit', 'credit', 'balance')
+    @field_validator('debit', 'credit', 'balance')
+    @classmethod
     def validate_amounts(cls, v):
         """Ensure amounts are positive numbers"""
         if v is None:
             return 0.0
         return abs(float(v))
     
-    @validator('date')
+    @field_validator('date')
+    @classmethod
     def validate_date(cls, v):
         """Validate and normalize date format"""
-        if not v:
-            return ""
-        
-        # Try to parse common date formats
-        date_formats = [
-            "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d",
-            "%m-%d-%Y", "%d-%m-%Y", "%Y/%m/%d",
-            "%m/%d/%y", "%d/%m/%y"
-        ]
-        
-        for fmt in date_formats:
-            try:
-                parsed_date = datetime.strptime(v.strip(), fmt)
-                # Return in consistent MM/DD/YYYY format
-                return parsed_date.strftime("%m/%d/%Y")
-            except ValueError:
-                continue
-        
-        # If no format matches, return original
-        return v
+        return _normalize_date(v)
     
-    @validator('category', pre=False, always=True)
-    def auto_categorize(cls, v, values):
+    @field_validator('category')
+    @classmethod
+    def auto_categorize(cls, v, info: ValidationInfo):
         """Auto-categorize based on description if not provided"""
         if v:
             return v
+        values = info.data
             
         description = values.get('description', '').lower()
         
-        # Category mapping with more specific keywords
-        categories = {
-            'Groceries': ['grocery', 'food', 'market', 'supermarket', 'walmart'],
-            'Transportation': ['gas station', 'fuel', 'petrol', 'uber', 'lyft', 'taxi', 'parking'],
-            'Dining': ['restaurant', 'cafe', 'coffee', 'dining', 'pizza', 'food'],
-            'Shopping': ['amazon', 'online shop', 'ebay', 'store', 'purchase'],
-            'Utilities': ['utility', 'electric', 'water bill', 'gas bill', 'internet', 'phone'],
-            'Housing': ['rent', 'mortgage', 'lease'],
-            'Income': ['salary', 'payroll', 'wage', 'deposit', 'direct deposit'],
-            'Transfer': ['transfer', 'payment', 'zelle', 'venmo', 'atm'],
-            'Healthcare': ['pharmacy', 'doctor', 'medical', 'hospital'],
-            'Entertainment': ['movie', 'netflix', 'spotify', 'game'],
-            'Banking': ['service fee', 'bank fee', 'overdraft', 'interest']
-        }
-        
         # Check for income first (credits usually)
         if values.get('credit', 0) > 0 and values.get('debit', 0) == 0:
-            if any(keyword in description for keyword in ['salary', 'payroll', 'wage', 'deposit']):
+            if _INCOME_RE.search(description):
                 return 'Income'
         
-        # Check other categories
-        for category, keywords in categories.items():
-            if any(keyword in description for keyword in keywords):
-                return category
+        # Check other categories in a single pass over the description
+        category = _CATEGORY_MATCHER.match(description)
+        if category:
+            return category
         
         # Special case for ATM
         if 'atm' in description and values.get('debit', 0) > 0:
@@ -98,6 +110,28 @@ class BankTransaction(BaseModel):
         return "Other"
 
 
+@functools.lru_cache(maxsize=4096)
+def _normalize_date(v: str) -> str:
+    """Normalize a date string to MM/DD/YYYY, returning it unchanged if unknown
+
+    Statements repeat the same few dates, so results are cached to avoid
+    re-running the strptime trial loop for every row.
+    """
+    if not v:
+        return ""
+    
+    for fmt in _DATE_FORMATS:
+        try:
+            parsed_date = datetime.strptime(v.strip(), fmt)
+            # Return in consistent MM/DD/YYYY format
+            return parsed_date.strftime("%m/%d/%Y")
+        except ValueError:
+            continue
+    
+    # If no format matches, return original
+    return v
+
+
 class BankStatement(BaseModel):
     """Model for a complete bank statement"""
     account_number: Optional[str] = Field(default="", description="Account number if available")
@@ -116,47 +150,51 @@ class BankStatement(BaseModel):
     
     def to_csv(self) -> str:
         """Convert transactions to CSV format"""
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Date', 'Description', 'Category', 'Debit', 'Credit', 'Balance'])
-        
-        # Write transactions
-        for trans in self.transactions:
-            writer.writerow([
-                trans.date,
-                trans.description,
-                trans.category,
-                f"{trans.debit:.2f}" if trans.debit > 0 else "",
-                f"{trans.credit:.2f}" if trans.credit > 0 else "",
-                f"{trans.balance:.2f}" if trans.balance > 0 else ""
-            ])
+        # Header, one line per transaction, then the summary block; lines are
+        # joined once at the end instead of going through csv.writer per row
+        rows = ['Date,Description,Category,Debit,Credit,Balance']
+        rows.extend(
+            f"{csv_field(t.date)},{csv_field(t.description)},{csv_field(t.category)},"
+            f"{csv_amount(t.debit)},{csv_amount(t.credit)},{csv_amount(t.balance)}"
+            for t in self.transactions
+        )
         
-        # Write summary
-        writer.writerow([])  # Empty row
-        writer.writerow(['Summary', '', '', '', '', ''])
-        writer.writerow(['Total Debits', '', '', f"{self.total_debits:.2f}", '', ''])
-        writer.writerow(['Total Credits', '', '', '', f"{self.total_credits:.2f}", ''])
+        rows.append('')  # Empty row
+        rows.append('Summary,,,,,')
+        rows.append(f"Total Debits,,,{self.total_debits:.2f},,")
+        rows.append(f"Total Credits,,,,{self.total_credits:.2f},")
         if self.opening_balance:
-            writer.writerow(['Opening Balance', '', '', '', '', f"{self.opening_balance:.2f}"])
+            rows.append(f"Opening Balance,,,,,{self.opening_balance:.2f}")
         if self.closing_balance:
-            writer.writerow(['Closing Balance', '', '', '', '', f"{self.closing_balance:.2f}"])
+            rows.append(f"Closing Balance,,,,,{self.closing_balance:.2f}")
         
-        return output.getvalue()
+        return '\r\n'.join(rows) + '\r\n'
     
     def to_json_pretty(self) -> str:
         """Convert to formatted JSON"""
-        return json.dumps(self.dict(), indent=2, default=str)
+        data = self.model_dump()
+        if orjson:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2, default=str).decode()
+        return json.dumps(data, indent=2, default=str)
+
+
+_TRANSACTION_LIST_ADAPTER = TypeAdapter(List[BankTransaction])
+
+# The output parser is stateless and its format instructions (a JSON-schema
+# dump of BankStatement) never change, so build both once at import time
+_OUTPUT_PARSER = PydanticOutputParser(pydantic_object=BankStatement)
+_FORMAT_INSTRUCTIONS = _OUTPUT_PARSER.get_format_instructions()
 
 
 class BankStatementParser:
     """Parser for extracting structured bank statement data"""
     
     def __init__(self):
-        self.parser = PydanticOutputParser(pydantic_object=BankStatement)
+        self.parser = _OUTPUT_PARSER
         
-        # Create prompt template with format instructions
+        # Create prompt template with format instructions. Everything before
+        # {bank_statement} is identical across calls, so the serving layer can
+        # reuse its cached prefix
         self.prompt_template = PromptTemplate(
             template="""Analyze the following bank statement and extract transaction data.
 
@@ -173,11 +211,9 @@ Important rules:
 Bank Statement:
 {bank_statement}
 
-{format_instructions}
-
 Extracted Data:""",
             input_variables=["bank_statement"],
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
+            partial_variables={"format_instructions": _FORMAT_INSTRUCTIONS}
         )
     
     def parse(self, ai_response: str) -> BankStatement:
@@ -185,6 +221,20 @@ Extracted Data:""",
         logger.info(f"Parsing AI response of length: {len(ai_response)}")
         logger.debug(f"First 500 chars of response: {ai_response[:500]}")
         
+        # Fast path: a response that is already a JSON object goes straight to
+        # validation without LangChain's markdown and regex handling
+        if ai_response.lstrip().startswith('{'):
+            json_text = extract_json(ai_response)
+            if json_text:
+                try:
+                    data = orjson.loads(json_text) if orjson else json.loads(json_text)
+                    bank_statement = BankStatement.model_validate(data)
+                    bank_statement.calculate_totals()
+                    logger.info(f"Fast JSON parse successful: {len(bank_statement.transactions)} transactions")
+                    return bank_statement
+                except Exception as e:
+                    logger.debug(f"Fast JSON parse failed: {e}")
+        
         try:
             # Try to parse the response directly
             logger.info("Attempting direct LangChain parse...")
@@ -197,11 +247,11 @@ Extracted Data:""",
             
             # If parsing fails, try to extract JSON from the response
             logger.info("Attempting JSON extraction...")
-            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-            if json_match:
+            json_text = extract_json(ai_response)
+            if json_text:
                 try:
-                    data = json.loads(json_match.group())
-                    bank_statement = BankStatement(**data)
+                    data = orjson.loads(json_text) if orjson else json.loads(json_text)
+                    bank_statement = BankStatement.model_validate(data)
                     bank_statement.calculate_totals()
                     logger.info(f"JSON parse successful: {len(bank_statement.transactions)} transactions")
                     return bank_statement
@@ -222,7 +272,7 @@ Extracted Data:""",
     
     def parse_table_format(self, text: str) -> BankStatement:
         """Parse table format from AI response"""
-        transactions = []
+        rows = []
         lines = text.split('\n')
         in_table = False
         
@@ -241,16 +291,14 @@ Extracted Data:""",
                 continue
                 
             if in_table:
-                # Try to parse transaction line
-                parts = re.split(r'\s{2,}|\t|\|', line)
-                parts = [p.strip() for p in parts if p.strip()]
+                # Try to parse transaction line. Look for the date first so
+                # lines without one are never split into columns
+                date_match = _DATE_RE.search(line)
                 
-                if len(parts) >= 3:
-                    # Look for date pattern
-                    date_pattern = r'\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}'
-                    date_match = re.search(date_pattern, line)
+                if date_match:
+                    parts = [p for p in _SPLIT_RE.split(line) if p.strip()]
                     
-                    if date_match:
+                    if len(parts) >= 3:
                         trans_data = {
                             'date': date_match.group(),
                             'description': '',
@@ -263,8 +311,7 @@ Extracted Data:""",
                         remaining = line[date_match.end():].strip()
                         
                         # Find amounts
-                        amount_pattern = r'[-+]?\$?\d+[,.]?\d*'
-                        amounts = re.findall(amount_pattern, remaining)
+                        amounts = _AMOUNT_RE.findall(remaining)
                         
                         if amounts:
                             # Description is text before first amount
@@ -273,12 +320,12 @@ Extracted Data:""",
                                 trans_data['description'] = remaining[:first_amount_pos].strip()
                             
                             # Parse amounts
+                            desc_lower = trans_data['description'].lower()
                             for i, amt in enumerate(amounts):
-                                amt_clean = amt.replace('$', '').replace(',', '')
+                                amt_clean = amt.translate(_MONEY_STRIP)
                                 amt_val = float(amt_clean)
                                 
                                 # Determine if debit or credit
-                                desc_lower = trans_data['description'].lower()
                                 if amt.startswith('-') or (i == 0 and amt_val > 0 and 'deposit' not in desc_lower and 'salary' not in desc_lower):
                                     trans_data['debit'] = abs(amt_val)
                                 elif amt.startswith('+') or 'deposit' in desc_lower or 'salary' in desc_lower:
@@ -287,10 +334,11 @@ Extracted Data:""",
                                     trans_data['balance'] = abs(amt_val)
                         
                         if trans_data['description']:  # Only add if we found a description
-                            trans = BankTransaction(**trans_data)
-                            transactions.append(trans)
+                            rows.append(trans_data)
         
-        return BankStatement(transactions=transactions)
+        # Validate every row in one call instead of one model per line
+        transactions = _TRANSACTION_LIST_ADAPTER.validate_python(rows)
+        return BankStatement.model_construct(transactions=transactions)
     
     def create_prompt(self, bank_statement_text: str) -> str:
         """Create formatted prompt for the AI"""
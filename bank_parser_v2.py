@@ -2,97 +2,159 @@
 Improved Bank Statement Parser using LangChain for structured output
 """
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
 from langchain.schema import BaseOutputParser
-import csv
-import io
+import functools
 import json
 from decimal import Decimal
 import logging
 import re
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from keyword_matcher import KeywordMatcher
+from parser_utils import csv_amount, csv_field, extract_json
+
 logger = logging.getLogger(__name__)
 
+# Patterns used on every line of the table parser
+_LINE_RE = re.compile(r'(?P<date>\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})(?P<rest>[^\n]*)')
+_MONEY_RE = re.compile(r'\$[\d,]+\.?\d*')
+_NUM_RE = re.compile(r'\b\d+[,.]?\d*\b')
+_STATEMENT_HEADER_RE = re.compile(r'^#+\s*Statement\s+\d+\s*$', re.MULTILINE)
+
+# Drops currency symbols and thousands separators in one pass
+_MONEY_STRIP = str.maketrans('', '', '$,')
+
+# Category mapping with more specific keywords, checked in order
+_CATEGORIES = (
+    ('Groceries', ('grocery', 'food', 'market', 'supermarket', 'walmart', 'kroger', 'safeway')),
+    ('Transportation', ('gas station', 'fuel', 'petrol', 'uber', 'lyft', 'taxi', 'parking', 'shell', 'chevron', 'exxon')),
+    ('Dining', ('restaurant', 'cafe', 'coffee', 'dining', 'pizza', 'food', 'mcdonald', 'starbucks')),
+    ('Shopping', ('amazon', 'online', 'ebay', 'store', 'purchase', 'shop')),
+    ('Utilities', ('utility', 'electric', 'water bill', 'gas bill', 'internet', 'phone', 'bill payment')),
+    ('Housing', ('rent', 'mortgage', 'lease', 'housing')),
+    ('Income', ('salary', 'payroll', 'wage', 'deposit', 'direct deposit', 'income')),
+    ('Transfer', ('transfer', 'payment', 'zelle', 'venmo', 'savings')),
+    ('Healthcare', ('pharmacy', 'doctor', 'medical', 'hospital', 'cvs', 'walgreens')),
+    ('Entertainment', ('movie', 'netflix', 'spotify', 'game', 'subscription')),
+    ('Banking', ('service fee', 'bank fee', 'overdraft', 'interest', 'atm fee')),
+    ('Cash', ('atm withdrawal', 'cash withdrawal', 'atm')),
+)
+_INCOME_KEYWORDS = ('salary', 'payroll', 'wage', 'deposit')
+
+_INCOME_RE = re.compile('|'.join(map(re.escape, _INCOME_KEYWORDS)))
+
+# Compiled once at import so categorization is one scan per description
+_CATEGORY_MATCHER = KeywordMatcher(_CATEGORIES)
+
+# Description hints that a table row's single amount is a credit
+_CREDIT_HINT_RE = re.compile(r'deposit|salary|income|credit')
+_CREDIT_COLUMN_HINT_RE = re.compile(r'deposit|salary|income')
+
+# Common date formats, tried in order
+_DATE_FORMATS = (
+    "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d",
+    "%m-%d-%Y", "%d-%m-%Y", "%Y/%m/%d",
+    "%m/%d/%y", "%d/%m/%y"
+)
+
 
 class BankTransaction(BaseModel):
     """Model for a single bank transaction"""
     date: str = Field(description="Transaction date in MM/DD/YYYY or DD/MM/YYYY format")
     description: str = Field(description="Transaction description or merchant name")
-    category: Optional[str] = Field(default=None, description="Transaction category")
+    category: Optional[str] = Field(default=None, description="Transaction category", validate_default=True)
     debit: Optional[float] = Field(default=0.0, description="Debit amount (positive number)")
     credit: Optional[float] = Field(default=0.0, description="Credit amount (positive number)")
     balance: Optional[float] = Field(default=0.0, description="Account balance after transaction")
     
-    @validator('debit', 'credit', 'balance')
+    @field_validator('debit', 'credit', 'balance')
+    @classmethod
     def validate_amounts(cls, v):
         """Ensure amounts are positive numbers"""
         if v is None:
             return 0.0
         return abs(float(v))
     
-    @validator('date')
+    @field_validator('date')
+    @classmethod
     def validate_date(cls, v):
         """Validate and normalize date format"""
-        if not v:
-            return ""
-        
-        # Try to parse common date formats
-        date_formats = [
-            "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d",
-            "%m-%d-%Y", "%d-%m-%Y", "%Y/%m/%d",
-            "%m/%d/%y", "%d/%m/%y"
-        ]
-        
-        for fmt in date_formats:
-            try:
-                parsed_date = datetime.strptime(v.strip(), fmt)
-                # Return in consistent MM/DD/YYYY format
-                return parsed_date.strftime("%m/%d/%Y")
-            except ValueError:
-                continue
-        
-        # If no format matches, return original
-        return v
+        return _normalize_date(v)
     
-    @validator('category', pre=False, always=True)
-    def auto_categorize(cls, v, values):
+    @field_validator('category')
+    @classmethod
+    def auto_categorize(cls, v, info: ValidationInfo):
         """Auto-categorize based on description if not provided"""
         if v:
             return v
-            
-        description = values.get('description', '').lower()
-        
-        # Category mapping with more specific keywords
-        categories = {
-            'Groceries': ['grocery', 'food', 'market', 'supermarket', 'walmart', 'kroger', 'safeway'],
-            'Transportation': ['gas station', 'fuel', 'petrol', 'uber', 'lyft', 'taxi', 'parking', 'shell', 'chevron', 'exxon'],
-            'Dining': ['restaurant', 'cafe', 'coffee', 'dining', 'pizza', 'food', 'mcdonald', 'starbucks'],
-            'Shopping': ['amazon', 'online', 'ebay', 'store', 'purchase', 'shop'],
-            'Utilities': ['utility', 'electric', 'water bill', 'gas bill', 'internet', 'phone', 'bill payment'],
-            'Housing': ['rent', 'mortgage', 'lease', 'housing'],
-            'Income': ['salary', 'payroll', 'wage', 'deposit', 'direct deposit', 'income'],
-            'Transfer': ['transfer', 'payment', 'zelle', 'venmo', 'savings'],
-            'Healthcare': ['pharmacy', 'doctor', 'medical', 'hospital', 'cvs', 'walgreens'],
-            'Entertainment': ['movie', 'netflix', 'spotify', 'game', 'subscription'],
-            'Banking': ['service fee', 'bank fee', 'overdraft', 'interest', 'atm fee'],
-            'Cash': ['atm withdrawal', 'cash withdrawal', 'atm']
-        }
-        
-        # Check for income first (credits usually)
-        if values.get('credit', 0) > 0 and values.get('debit', 0) == 0:
-            if any(keyword in description for keyword in ['salary', 'payroll', 'wage', 'deposit']):
-                return 'Income'
-        
-        # Check other categories
-        for category, keywords in categories.items():
-            if any(keyword in description for keyword in keywords):
-                return category
-            
-        return "Other"
+        values = info.data
+        return _categorize(values.get('description', ''), values.get('debit', 0), values.get('credit', 0))
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_date(v: str) -> str:
+    """Normalize a date string to MM/DD/YYYY, returning it unchanged if unknown"""
+    if not v:
+        return ""
+    
+    for fmt in _DATE_FORMATS:
+        try:
+            parsed_date = datetime.strptime(v.strip(), fmt)
+            # Return in consistent MM/DD/YYYY format
+            return parsed_date.strftime("%m/%d/%Y")
+        except ValueError:
+            continue
+    
+    # If no format matches, return original
+    return v
+
+
+def _assign_amounts(desc_lower: str, amounts: List[float], first_gap: int) -> Tuple[float, float, float]:
+    """Split the money amounts found on one line into (debit, credit, balance)
+
+    first_gap is the number of characters between the first and second amounts.
+    """
+    # Special handling for opening/closing balance, and a single amount with
+    # balance on the same line
+    if 'opening balance' in desc_lower or 'closing balance' in desc_lower or len(amounts) == 1:
+        return 0.0, 0.0, amounts[0]
+    
+    if len(amounts) == 2:
+        # Amount and balance
+        if _CREDIT_HINT_RE.search(desc_lower):
+            return 0.0, amounts[0], amounts[1]
+        return amounts[0], 0.0, amounts[1]
+    
+    # Debit, Credit, Balance columns. Significant spacing between the first
+    # and second amount means the credit column is empty
+    if first_gap > 5:
+        return amounts[0], 0.0, amounts[-1]
+    # Otherwise, check description for hints
+    if _CREDIT_COLUMN_HINT_RE.search(desc_lower):
+        return 0.0, amounts[0], amounts[-1]
+    return amounts[0], 0.0, amounts[-1]
+
+
+def _categorize(description: str, debit: float = 0.0, credit: float = 0.0) -> str:
+    """Pick a category for a transaction from its description"""
+    description = description.lower()
+    
+    # Check for income first (credits usually)
+    if credit > 0 and debit == 0:
+        if _INCOME_RE.search(description):
+            return 'Income'
+    
+    # Check other categories in a single pass over the description
+    return _CATEGORY_MATCHER.match(description) or "Other"
 
 
 class BankStatement(BaseModel):
@@ -113,47 +175,56 @@ class BankStatement(BaseModel):
     
     def to_csv(self) -> str:
         """Convert transactions to CSV format"""
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Date', 'Description', 'Category', 'Debit', 'Credit', 'Balance'])
-        
-        # Write transactions
-        for trans in self.transactions:
-            writer.writerow([
-                trans.date,
-                trans.description,
-                trans.category,
-                f"{trans.debit:.2f}" if trans.debit > 0 else "",
-                f"{trans.credit:.2f}" if trans.credit > 0 else "",
-                f"{trans.balance:.2f}" if trans.balance > 0 else ""
-            ])
+        # Header, one line per transaction, then the summary block; lines are
+        # joined once at the end instead of going through csv.writer per row
+        rows = ['Date,Description,Category,Debit,Credit,Balance']
+        rows.extend(
+            f"{csv_field(t.date)},{csv_field(t.description)},{csv_field(t.category)},"
+            f"{csv_amount(t.debit)},{csv_amount(t.credit)},{csv_amount(t.balance)}"
+            for t in self.transactions
+        )
         
-        # Write summary
-        writer.writerow([])  # Empty row
-        writer.writerow(['Summary', '', '', '', '', ''])
-        writer.writerow(['Total Debits', '', '', f"{self.total_debits:.2f}", '', ''])
-        writer.writerow(['Total Credits', '', '', '', f"{self.total_credits:.2f}", ''])
+        rows.append('')  # Empty row
+        rows.append('Summary,,,,,')
+        rows.append(f"Total Debits,,,{self.total_debits:.2f},,")
+        rows.append(f"Total Credits,,,,{self.total_credits:.2f},")
         if self.opening_balance:
-            writer.writerow(['Opening Balance', '', '', '', '', f"{self.opening_balance:.2f}"])
+            rows.append(f"Opening Balance,,,,,{self.opening_balance:.2f}")
         if self.closing_balance:
-            writer.writerow(['Closing Balance', '', '', '', '', f"{self.closing_balance:.2f}"])
+            rows.append(f"Closing Balance,,,,,{self.closing_balance:.2f}")
         
-        return output.getvalue()
+        return '\r\n'.join(rows) + '\r\n'
     
     def to_json_pretty(self) -> str:
         """Convert to formatted JSON"""
-        return json.dumps(self.dict(), indent=2, default=str)
+        data = self.model_dump()
+        if orjson:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2, default=str).decode()
+        return json.dumps(data, indent=2, default=str)
+
+
+class BankStatementBatch(BaseModel):
+    """Model for several bank statements extracted from one batched prompt"""
+    statements: List[BankStatement] = Field(description="One entry per input statement, in the same order")
+
+
+# The output parser is stateless and its format instructions (a JSON-schema
+# dump of BankStatement) never change, so build both once at import time
+_OUTPUT_PARSER = PydanticOutputParser(pydantic_object=BankStatement)
+_FORMAT_INSTRUCTIONS = _OUTPUT_PARSER.get_format_instructions()
+_BATCH_OUTPUT_PARSER = PydanticOutputParser(pydantic_object=BankStatementBatch)
+_BATCH_FORMAT_INSTRUCTIONS = _BATCH_OUTPUT_PARSER.get_format_instructions()
 
 
 class BankStatementParser:
     """Parser for extracting structured bank statement data"""
     
     def __init__(self):
-        self.parser = PydanticOutputParser(pydantic_object=BankStatement)
+        self.parser = _OUTPUT_PARSER
         
-        # Create prompt template with format instructions
+        # Create prompt template with format instructions. Everything before
+        # {bank_statement} is identical across calls, so the serving layer can
+        # reuse its cached prefix
         self.prompt_template = PromptTemplate(
             template="""Analyze the following bank statement and extract transaction data.
 
@@ -170,11 +241,33 @@ Important rules:
 Bank Statement:
 {bank_statement}
 
+Extracted Data:""",
+            input_variables=["bank_statement"],
+            partial_variables={"format_instructions": _FORMAT_INSTRUCTIONS}
+        )
+        
+        # Batched variant: all static text comes before the statements so every
+        # batch shares one prompt prefix
+        self.batch_parser = _BATCH_OUTPUT_PARSER
+        self.batch_prompt_template = PromptTemplate(
+            template="""Analyze each of the following bank statements and extract transaction data.
+
 {format_instructions}
 
+Important rules:
+1. Extract ALL transactions found in each document
+2. Use positive numbers for both debits and credits
+3. Debits are withdrawals/expenses (money going out)
+4. Credits are deposits/income (money coming in)
+5. Include the running balance if available
+6. Auto-categorize transactions based on description
+7. Return one entry in "statements" per statement below, in the same order
+
+{bank_statements}
+
 Extracted Data:""",
-            input_variables=["bank_statement"],
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
+            input_variables=["bank_statements"],
+            partial_variables={"format_instructions": _BATCH_FORMAT_INSTRUCTIONS}
         )
     
     def parse(self, ai_response: str) -> BankStatement:
@@ -182,6 +275,20 @@ Extracted Data:""",
         logger.info(f"Parsing AI response of length: {len(ai_response)}")
         logger.debug(f"First 500 chars of response: {ai_response[:500]}")
         
+        # Fast path: a response that is already a JSON object goes straight to
+        # validation without LangChain's markdown and regex handling
+        if ai_response.lstrip().startswith('{'):
+            json_text = extract_json(ai_response)
+            if json_text:
+                try:
+                    data = orjson.loads(json_text) if orjson else json.loads(json_text)
+                    bank_statement = BankStatement.model_validate(data)
+                    bank_statement.calculate_totals()
+                    logger.info(f"Fast JSON parse successful: {len(bank_statement.transactions)} transactions")
+                    return bank_statement
+                except Exception as e:
+                    logger.debug(f"Fast JSON parse failed: {e}")
+        
         try:
             # Try to parse the response directly
             logger.info("Attempting direct LangChain parse...")
@@ -194,11 +301,11 @@ Extracted Data:""",
             
             # If parsing fails, try to extract JSON from the response
             logger.info("Attempting JSON extraction...")
-            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-            if json_match:
+            json_text = extract_json(ai_response)
+            if json_text:
                 try:
-                    data = json.loads(json_match.group())
-                    bank_statement = BankStatement(**data)
+                    data = orjson.loads(json_text) if orjson else json.loads(json_text)
+                    bank_statement = BankStatement.model_validate(data)
                     bank_statement.calculate_totals()
                     logger.info(f"JSON parse successful: {len(bank_statement.transactions)} transactions")
                     return bank_statement
@@ -220,109 +327,111 @@ Extracted Data:""",
     def parse_table_format_v2(self, text: str) -> BankStatement:
         """Improved table format parser"""
         transactions = []
-        lines = text.split('\n')
         
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
+        # One scan over the whole text: each match is the first date on a line
+        # plus the rest of that line, so lines without a date are never visited
+        for line_match in _LINE_RE.finditer(text):
+            # Found a potential transaction line
+            trans_data = {
+                'date': line_match.group('date'),
+                'description': '',
+                'debit': 0,
+                'credit': 0,
+                'balance': 0
+            }
             
-            # Look for date pattern
-            date_pattern = r'\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}'
-            date_match = re.search(date_pattern, line)
+            # Everything after the date up to the end of its line
+            remaining = line_match.group('rest').strip()
             
-            if date_match:
-                # Found a potential transaction line
-                trans_data = {
-                    'date': date_match.group(),
-                    'description': '',
-                    'debit': 0,
-                    'credit': 0,
-                    'balance': 0
-                }
-                
-                # Extract the rest of the line after the date
-                date_end = date_match.end()
-                remaining = line[date_end:].strip()
-                
-                # Find all money amounts (with dollar signs)
-                money_pattern = r'\$[\d,]+\.?\d*'
-                money_matches = list(re.finditer(money_pattern, remaining))
-                
-                if money_matches:
-                    # Description is everything before the first money amount
-                    first_money_start = money_matches[0].start()
-                    trans_data['description'] = remaining[:first_money_start].strip()
-                    
-                    # Process money amounts
-                    amounts = []
-                    for match in money_matches:
-                        amt_str = match.group().replace('$', '').replace(',', '')
-                        amounts.append(float(amt_str))
-                    
-                    # Determine what each amount represents
-                    desc_lower = trans_data['description'].lower()
-                    
-                    # Special handling for opening/closing balance
-                    if 'opening balance' in desc_lower:
-                        trans_data['balance'] = amounts[0] if amounts else 0
-                    elif 'closing balance' in desc_lower:
-                        trans_data['balance'] = amounts[0] if amounts else 0
-                    else:
-                        # Regular transaction
-                        if len(amounts) == 1:
-                            # Single amount with balance on same line
-                            trans_data['balance'] = amounts[0]
-                        elif len(amounts) == 2:
-                            # Amount and balance
-                            if any(kw in desc_lower for kw in ['deposit', 'salary', 'income', 'credit']):
-                                trans_data['credit'] = amounts[0]
-                            else:
-                                trans_data['debit'] = amounts[0]
-                            trans_data['balance'] = amounts[1]
-                        elif len(amounts) >= 3:
-                            # Debit, Credit, Balance columns
-                            # Check spacing between amounts to determine column assignment
-                            debit_match = money_matches[0]
-                            credit_match = money_matches[1] if len(money_matches) > 1 else None
-                            balance_match = money_matches[-1]
-                            
-                            # If there's significant spacing between first and second amount,
-                            # it likely means first is debit, second is credit
-                            if credit_match and (credit_match.start() - debit_match.end()) > 5:
-                                trans_data['debit'] = amounts[0]
-                                # Credit column might be empty (represented by spacing)
-                                trans_data['balance'] = amounts[-1]
-                            else:
-                                # Otherwise, check description for hints
-                                if any(kw in desc_lower for kw in ['deposit', 'salary', 'income']):
-                                    trans_data['credit'] = amounts[0]
-                                else:
-                                    trans_data['debit'] = amounts[0]
-                                trans_data['balance'] = amounts[-1]
-                else:
-                    # No amounts found with $, try without
-                    num_pattern = r'\b\d+[,.]?\d*\b'
-                    nums = re.findall(num_pattern, remaining)
-                    if nums:
-                        # Take everything before first number as description
-                        first_num_match = re.search(num_pattern, remaining)
-                        if first_num_match:
-                            trans_data['description'] = remaining[:first_num_match.start()].strip()
+            # Find all money amounts (with dollar signs)
+            money_matches = list(_MONEY_RE.finditer(remaining))
+            
+            if money_matches:
+                # Description is everything before the first money amount
+                first_money_start = money_matches[0].start()
+                trans_data['description'] = remaining[:first_money_start].strip()
                 
-                # Clean up description
-                trans_data['description'] = trans_data['description'].strip('|').strip()
+                # Process money amounts
+                amounts = []
+                for match in money_matches:
+                    amt_str = match.group().translate(_MONEY_STRIP)
+                    amounts.append(float(amt_str))
                 
-                # Only add if we have a valid description
-                if trans_data['description'] and not trans_data['description'].lower() in ['total debits', 'total credits', 'ending balance']:
-                    trans = BankTransaction(**trans_data)
-                    transactions.append(trans)
-        
-        return BankStatement(transactions=transactions)
+                # Determine what each amount represents; the gap between the
+                # first two amounts tells an empty credit column from a filled one
+                first_gap = money_matches[1].start() - money_matches[0].end() if len(money_matches) > 1 else 0
+                trans_data['debit'], trans_data['credit'], trans_data['balance'] = _assign_amounts(
+                    trans_data['description'].lower(), amounts, first_gap
+                )
+            else:
+                # No amounts found with $, try without
+                nums = _NUM_RE.findall(remaining)
+                if nums:
+                    # Take everything before first number as description
+                    first_num_match = _NUM_RE.search(remaining)
+                    if first_num_match:
+                        trans_data['description'] = remaining[:first_num_match.start()].strip()
+            
+            # Clean up description
+            trans_data['description'] = trans_data['description'].strip('|').strip()
+            
+            # Only add if we have a valid description
+            if trans_data['description'] and not trans_data['description'].lower() in ['total debits', 'total credits', 'ending balance']:
+                # Built with the validators' normalization applied directly,
+                # skipping pydantic validation
+                transactions.append(BankTransaction.model_construct(
+                    date=_normalize_date(trans_data['date']),
+                    description=trans_data['description'],
+                    # Categorized as the validator would: it runs before
+                    # debit/credit are validated and so sees neither amount
+                    category=_categorize(trans_data['description']),
+                    debit=abs(float(trans_data['debit'])),
+                    credit=abs(float(trans_data['credit'])),
+                    balance=abs(float(trans_data['balance']))
+                ))
+    
+        # Rows are already normalized, so skip re-validating them
+        return BankStatement.model_construct(transactions=transactions)
     
     def create_prompt(self, bank_statement_text: str) -> str:
         """Create formatted prompt for the AI"""
         return self.prompt_template.format(bank_statement=bank_statement_text)
+    
+    def create_batched_prompt(self, statements: List[str], k: int = 4) -> List[str]:
+        """Pack statements into prompts of up to k statements each
+        
+        One model call per batch instead of per statement; parse each
+        response with parse_batched().
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        
+        prompts = []
+        for offset in range(0, len(statements), k):
+            sections = "\n".join(
+                f"### Statement {i}\n{text}\n"
+                for i, text in enumerate(statements[offset:offset + k], 1)
+            )
+            prompts.append(self.batch_prompt_template.format(bank_statements=sections))
+        return prompts
+    
+    def parse_batched(self, ai_response: str) -> List[BankStatement]:
+        """Parse the response to a batched prompt into one statement per input"""
+        json_text = extract_json(ai_response)
+        if json_text:
+            try:
+                data = orjson.loads(json_text) if orjson else json.loads(json_text)
+                items = data.get('statements')
+                if isinstance(items, list):
+                    return [BankStatement.model_validate(item).calculate_totals() for item in items]
+            except Exception as e:
+                logger.warning(f"Batched JSON parse failed: {e}")
+        
+        # Fall back to the per-statement sections if the model echoed them
+        sections = _STATEMENT_HEADER_RE.split(ai_response)[1:]
+        if sections:
+            return [self.parse(section) for section in sections]
+        return [self.parse(ai_response)]
 
 
 # Keep the same helper function
@@ -4,96 +4,196 @@ Improved Bank Statement Parser v3 - handles various table formats
 
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
 from langchain.schema import BaseOutputParser
-import csv
-import io
+import calendar
+import functools
 import json
 from decimal import Decimal
 import logging
 import re
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from keyword_matcher import KeywordMatcher
+from parser_utils import csv_amount, csv_field, extract_json
+
 logger = logging.getLogger(__name__)
 
+# Category mapping with more specific keywords (earlier categories win)
+_CATEGORY_KEYWORDS = {
+    'Groceries': ['grocery', 'food', 'market', 'supermarket', 'walmart', 'kroger', 'safeway'],
+    'Transportation': ['gas station', 'fuel', 'petrol', 'uber', 'lyft', 'taxi', 'parking', 'shell', 'chevron', 'exxon'],
+    'Dining': ['restaurant', 'cafe', 'coffee', 'dining', 'pizza', 'food', 'mcdonald', 'starbucks'],
+    'Shopping': ['amazon', 'online', 'ebay', 'store', 'purchase', 'shop', 'electronics'],
+    'Utilities': ['utility', 'electric', 'water bill', 'gas bill', 'internet', 'phone', 'bill payment'],
+    'Housing': ['rent', 'mortgage', 'lease', 'housing'],
+    'Income': ['salary', 'payroll', 'wage', 'deposit', 'direct deposit', 'income'],
+    'Transfer': ['transfer', 'payment', 'zelle', 'venmo', 'savings'],
+    'Healthcare': ['pharmacy', 'doctor', 'medical', 'hospital', 'cvs', 'walgreens'],
+    'Entertainment': ['movie', 'netflix', 'spotify', 'game', 'subscription'],
+    'Banking': ['service fee', 'bank fee', 'overdraft', 'interest', 'atm fee', 'fees'],
+    'Cash': ['atm withdrawal', 'cash withdrawal', 'atm'],
+    'Bills': ['bill payment', 'mastercard', 'visa', 'amex', 'credit card']
+}
+_INCOME_KEYWORDS = ('salary', 'payroll', 'wage', 'deposit')
+_INCOME_RE = re.compile('|'.join(map(re.escape, _INCOME_KEYWORDS)))
+
+# Compiled once at import so categorization is one scan per description
+_CATEGORY_MATCHER = KeywordMatcher(_CATEGORY_KEYWORDS.items())
+
+# Header cell keywords per column field; the first field matching a cell wins
+_HEADER_FIELDS = (
+    ('date', ('date',)),
+    ('description', ('description', 'transaction')),
+    ('debit', ('debit', 'withdrawal')),
+    ('credit', ('credit', 'deposit')),
+    ('balance', ('balance',)),
+    ('ref', ('ref',)),
+)
+_HEADER_MATCHER = KeywordMatcher(_HEADER_FIELDS)
+
+# Patterns used on every line of a table response, compiled once
+_DATE_RE = re.compile(r'\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}')
+_NUM_RE = re.compile(r'[-+]?\$?[\d,]+\.?\d*')
+# Everything but digits, '.' and '-', so thousands separators go in the same pass
+_NON_NUM_RE = re.compile(r'[^\d.\-]')
+
+# Drops currency symbols and thousands separators in one pass
+_MONEY_STRIP = str.maketrans('', '', '$,')
+
+# Supported date formats, tried in order
+_DATE_FORMATS = (
+    "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d",
+    "%m-%d-%Y", "%d-%m-%Y", "%Y/%m/%d",
+    "%m/%d/%y", "%d/%m/%y"
+)
+
+# Fast path for _DATE_FORMATS: three ASCII digit groups sharing one separator,
+# and per separator the (month, day, year) group positions and year width of
+# each format in the same order
+_DATE_PARTS_RE = re.compile(r'([0-9]{1,4})([/-])([0-9]{1,2})\2([0-9]{1,4})')
+_DATE_LAYOUTS = {
+    '/': ((0, 1, 2, 4), (1, 0, 2, 4), (1, 2, 0, 4), (0, 1, 2, 2), (1, 0, 2, 2)),
+    '-': ((1, 2, 0, 4), (0, 1, 2, 4), (1, 0, 2, 4)),
+}
+
 
 class BankTransaction(BaseModel):
     """Model for a single bank transaction"""
     date: str = Field(description="Transaction date in MM/DD/YYYY or DD/MM/YYYY format")
     description: str = Field(description="Transaction description or merchant name")
-    category: Optional[str] = Field(default=None, description="Transaction category")
+    category: Optional[str] = Field(default=None, description="Transaction category", validate_default=True)
     debit: Optional[float] = Field(default=0.0, description="Debit amount (positive number)")
     credit: Optional[float] = Field(default=0.0, description="Credit amount (positive number)")
     balance: Optional[float] = Field(default=0.0, description="Account balance after transaction")
     
-    @validator('debit', 'credit', 'balance')
+    @field_validator('debit', 'credit', 'balance')
+    @classmethod
     def validate_amounts(cls, v):
         """Ensure amounts are positive numbers"""
         if v is None:
             return 0.0
         return abs(float(v))
     
-    @validator('date')
+    @field_validator('date')
+    @classmethod
     def validate_date(cls, v):
         """Validate and normalize date format"""
-        if not v:
-            return ""
-        
-        # Try to parse common date formats
-        date_formats = [
-            "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d",
-            "%m-%d-%Y", "%d-%m-%Y", "%Y/%m/%d",
-            "%m/%d/%y", "%d/%m/%y"
-        ]
-        
-        for fmt in date_formats:
-            try:
-                parsed_date = datetime.strptime(v.strip(), fmt)
-                # Return in consistent MM/DD/YYYY format
-                return parsed_date.strftime("%m/%d/%Y")
-            except ValueError:
-                continue
-        
-        # If no format matches, return original
-        return v
+        return _normalize_date(v)
     
-    @validator('category', pre=False, always=True)
-    def auto_categorize(cls, v, values):
+    @field_validator('category')
+    @classmethod
+    def auto_categorize(cls, v, info: ValidationInfo):
         """Auto-categorize based on description if not provided"""
         if v:
             return v
-            
-        description = values.get('description', '').lower()
-        
-        # Category mapping with more specific keywords
-        categories = {
-            'Groceries': ['grocery', 'food', 'market', 'supermarket', 'walmart', 'kroger', 'safeway'],
-            'Transportation': ['gas station', 'fuel', 'petrol', 'uber', 'lyft', 'taxi', 'parking', 'shell', 'chevron', 'exxon'],
-            'Dining': ['restaurant', 'cafe', 'coffee', 'dining', 'pizza', 'food', 'mcdonald', 'starbucks'],
-            'Shopping': ['amazon', 'online', 'ebay', 'store', 'purchase', 'shop', 'electronics'],
-            'Utilities': ['utility', 'electric', 'water bill', 'gas bill', 'internet', 'phone', 'bill payment'],
-            'Housing': ['rent', 'mortgage', 'lease', 'housing'],
-            'Income': ['salary', 'payroll', 'wage', 'deposit', 'direct deposit', 'income'],
-            'Transfer': ['transfer', 'payment', 'zelle', 'venmo', 'savings'],
-            'Healthcare': ['pharmacy', 'doctor', 'medical', 'hospital', 'cvs', 'walgreens'],
-            'Entertainment': ['movie', 'netflix', 'spotify', 'game', 'subscription'],
-            'Banking': ['service fee', 'bank fee', 'overdraft', 'interest', 'atm fee', 'fees'],
-            'Cash': ['atm withdrawal', 'cash withdrawal', 'atm'],
-            'Bills': ['bill payment', 'mastercard', 'visa', 'amex', 'credit card']
-        }
-        
-        # Check for income first (credits usually)
-        if values.get('credit', 0) > 0 and values.get('debit', 0) == 0:
-            if any(keyword in description for keyword in ['salary', 'payroll', 'wage', 'deposit']):
-                return 'Income'
+        values = info.data
+        return _categorize(values.get('description', ''), values.get('debit', 0), values.get('credit', 0))
+
+
+def _categorize(description: str, debit: float = 0.0, credit: float = 0.0) -> str:
+    """Pick a category for a transaction from its description"""
+    description = description.lower()
+    
+    # Check for income first (credits usually)
+    if credit > 0 and debit == 0:
+        if _INCOME_RE.search(description):
+            return 'Income'
+    
+    # Check other categories in a single pass over the description
+    category = _CATEGORY_MATCHER.match(description)
+    if category:
+        return category
         
-        # Check other categories
-        for category, keywords in categories.items():
-            if any(keyword in description for keyword in keywords):
-                return category
-            
-        return "Other"
+    return "Other"
+
+
+def _make_transaction(date: str, description: str, debit: float = 0.0,
+                      credit: float = 0.0, balance: float = 0.0) -> BankTransaction:
+    """Build a table-parsed row with the validators' normalization applied directly
+
+    Skips pydantic validation, which dominates per-row cost. Category is chosen
+    as the validator would: it runs before debit/credit are validated and so
+    sees neither amount.
+    """
+    return BankTransaction.model_construct(
+        date=_normalize_date(date),
+        description=description,
+        category=_categorize(description),
+        debit=abs(float(debit)),
+        credit=abs(float(credit)),
+        balance=abs(float(balance))
+    )
+
+
+def _normalize_date(v: str) -> str:
+    """Normalize a date string to MM/DD/YYYY, returning it unchanged if unknown
+
+    Splits the date into its three numeric parts and tries the layouts in the
+    same order as _DATE_FORMATS, so results match the strptime loop without
+    parsing a format string per attempt.
+    """
+    if not v:
+        return ""
+    
+    match = _DATE_PARTS_RE.fullmatch(v.strip())
+    if match is None:
+        # Unusual shapes (e.g. space-padded days) go through strptime
+        return _normalize_date_strptime(v)
+    
+    parts = (match.group(1), match.group(3), match.group(4))
+    for month_idx, day_idx, year_idx, year_len in _DATE_LAYOUTS[match.group(2)]:
+        if len(parts[year_idx]) != year_len or len(parts[month_idx]) > 2 or len(parts[day_idx]) > 2:
+            continue
+        month, day, year = int(parts[month_idx]), int(parts[day_idx]), int(parts[year_idx])
+        if year_len == 2:
+            # Same pivot as strptime's %y
+            year += 2000 if year <= 68 else 1900
+        if 1 <= month <= 12 and year >= 1 and 1 <= day <= calendar.monthrange(year, month)[1]:
+            return f"{month:02d}/{day:02d}/{year}"
+    
+    # If no layout matches, return original
+    return v
+
+
+def _normalize_date_strptime(v: str) -> str:
+    """Slow path for _normalize_date: try each of _DATE_FORMATS with strptime"""
+    for fmt in _DATE_FORMATS:
+        try:
+            parsed_date = datetime.strptime(v.strip(), fmt)
+            # Return in consistent MM/DD/YYYY format
+            return parsed_date.strftime("%m/%d/%Y")
+        except ValueError:
+            continue
+    
+    # If no format matches, return original
+    return v
 
 
 class BankStatement(BaseModel):
@@ -108,53 +208,60 @@ class BankStatement(BaseModel):
     
     def calculate_totals(self):
         """Calculate total debits and credits"""
-        self.total_debits = sum(t.debit for t in self.transactions)
-        self.total_credits = sum(t.credit for t in self.transactions)
+        # One pass accumulating both totals
+        total_debits = total_credits = 0.0
+        for t in self.transactions:
+            total_debits += t.debit
+            total_credits += t.credit
+        self.total_debits = total_debits
+        self.total_credits = total_credits
         return self
     
     def to_csv(self) -> str:
         """Convert transactions to CSV format"""
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Date', 'Description', 'Category', 'Debit', 'Credit', 'Balance'])
-        
-        # Write transactions
-        for trans in self.transactions:
-            writer.writerow([
-                trans.date,
-                trans.description,
-                trans.category,
-                f"{trans.debit:.2f}" if trans.debit > 0 else "",
-                f"{trans.credit:.2f}" if trans.credit > 0 else "",
-                f"{trans.balance:.2f}" if trans.balance > 0 else ""
-            ])
+        # Header, one line per transaction, then the summary block; lines are
+        # joined once at the end instead of going through csv.writer per row
+        rows = ['Date,Description,Category,Debit,Credit,Balance']
+        rows.extend(
+            f"{csv_field(t.date)},{csv_field(t.description)},{csv_field(t.category)},"
+            f"{csv_amount(t.debit)},{csv_amount(t.credit)},{csv_amount(t.balance)}"
+            for t in self.transactions
+        )
         
-        # Write summary
-        writer.writerow([])  # Empty row
-        writer.writerow(['Summary', '', '', '', '', ''])
-        writer.writerow(['Total Debits', '', '', f"{self.total_debits:.2f}", '', ''])
-        writer.writerow(['Total Credits', '', '', '', f"{self.total_credits:.2f}", ''])
+        rows.append('')  # Empty row
+        rows.append('Summary,,,,,')
+        rows.append(f"Total Debits,,,{self.total_debits:.2f},,")
+        rows.append(f"Total Credits,,,,{self.total_credits:.2f},")
         if self.opening_balance:
-            writer.writerow(['Opening Balance', '', '', '', '', f"{self.opening_balance:.2f}"])
+            rows.append(f"Opening Balance,,,,,{self.opening_balance:.2f}")
         if self.closing_balance:
-            writer.writerow(['Closing Balance', '', '', '', '', f"{self.closing_balance:.2f}"])
+            rows.append(f"Closing Balance,,,,,{self.closing_balance:.2f}")
         
-        return output.getvalue()
+        return '\r\n'.join(rows) + '\r\n'
     
     def to_json_pretty(self) -> str:
         """Convert to formatted JSON"""
-        return json.dumps(self.dict(), indent=2, default=str)
+        data = self.model_dump()
+        if orjson:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2, default=str).decode()
+        return json.dumps(data, indent=2, default=str)
+
+
+# The output parser is stateless and its format instructions (a JSON-schema
+# dump of BankStatement) never change, so build both once at import time
+_OUTPUT_PARSER = PydanticOutputParser(pydantic_object=BankStatement)
+_FORMAT_INSTRUCTIONS = _OUTPUT_PARSER.get_format_instructions()
 
 
 class BankStatementParser:
     """Parser for extracting structured bank statement data"""
     
     def __init__(self):
-        self.parser = PydanticOutputParser(pydantic_object=BankStatement)
+        self.parser = _OUTPUT_PARSER
         
-        # Create prompt template with format instructions
+        # Create prompt template with format instructions. Everything before
+        # {bank_statement} is identical across calls, so the serving layer can
+        # reuse its cached prefix
         self.prompt_template = PromptTemplate(
             template="""Analyze the following bank statement and extract transaction data.
 
@@ -171,11 +278,9 @@ Important rules:
 Bank Statement:
 {bank_statement}
 
-{format_instructions}
-
 Extracted Data:""",
             input_variables=["bank_statement"],
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
+            partial_variables={"format_instructions": _FORMAT_INSTRUCTIONS}
         )
     
     def parse(self, ai_response: str) -> BankStatement:
@@ -195,11 +300,11 @@ Extracted Data:""",
             
             # If parsing fails, try to extract JSON from the response
             logger.info("Attempting JSON extraction...")
-            json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-            if json_match:
+            json_text = extract_json(ai_response)
+            if json_text:
                 try:
-                    data = json.loads(json_match.group())
-                    bank_statement = BankStatement(**data)
+                    data = orjson.loads(json_text) if orjson else json.loads(json_text)
+                    bank_statement = BankStatement.model_validate(data)
                     bank_statement.calculate_totals()
                     logger.info(f"JSON parse successful: {len(bank_statement.transactions)} transactions")
                     return bank_statement
@@ -210,7 +315,6 @@ Extracted Data:""",
             logger.info("Attempting improved table format parse v3...")
             bank_statement = self.parse_table_format_v3(ai_response)
             if bank_statement.transactions:
-                bank_statement.calculate_totals()
                 logger.info(f"Table parse successful: {len(bank_statement.transactions)} transactions")
                 return bank_statement
             
@@ -221,7 +325,8 @@ Extracted Data:""",
     def parse_table_format_v3(self, text: str) -> BankStatement:
         """Enhanced table format parser that handles various formats"""
         transactions = []
-        lines = text.split('\n')
+        total_debits = total_credits = 0.0
+        lines = text.splitlines()
         
         # Try to detect table header to understand column layout
         header_line = None
@@ -239,18 +344,15 @@ Extracted Data:""",
         column_map = self._analyze_header(header_line) if header_line else None
         logger.debug(f"Column mapping: {column_map}")
         
-        # Parse transactions
-        for i, line in enumerate(lines):
-            if i <= header_idx + 1:  # Skip header and separator lines
-                continue
-                
+        # Parse transactions, skipping the header and separator lines (and the
+        # first line when no header was found)
+        for line in lines[header_idx + 2:]:
             line = line.strip()
-            if not line or line.startswith('-') or line.startswith('='):
+            if not line or line[0] in '-=':
                 continue
             
             # Look for date pattern
-            date_pattern = r'\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}'
-            date_match = re.search(date_pattern, line)
+            date_match = _DATE_RE.search(line)
             
             if date_match:
                 # Parse based on whether it's pipe-delimited or space-delimited
@@ -261,39 +363,39 @@ Extracted Data:""",
                 
                 if trans and trans.description and 'balance' not in trans.description.lower():
                     transactions.append(trans)
+                    total_debits += trans.debit
+                    total_credits += trans.credit
         
-        return BankStatement(transactions=transactions)
+        # Rows are already normalized, so skip re-validating them; totals were
+        # accumulated while parsing
+        return BankStatement.model_construct(
+            transactions=transactions,
+            total_debits=total_debits,
+            total_credits=total_credits
+        )
     
     def _analyze_header(self, header: str) -> dict:
         """Analyze header to determine column positions"""
-        header_lower = header.lower()
         columns = {}
         
         # Split by pipe if present
         if '|' in header:
             parts = [p.strip() for p in header.split('|')]
             for i, part in enumerate(parts):
-                part_lower = part.lower()
-                if 'date' in part_lower:
-                    columns['date'] = i
-                elif 'description' in part_lower or 'transaction' in part_lower:
-                    columns['description'] = i
-                elif 'debit' in part_lower or 'withdrawal' in part_lower:
-                    columns['debit'] = i
-                elif 'credit' in part_lower or 'deposit' in part_lower:
-                    columns['credit'] = i
-                elif 'balance' in part_lower:
-                    columns['balance'] = i
-                elif 'ref' in part_lower:
-                    columns['ref'] = i
+                field = _HEADER_MATCHER.match(part.lower())
+                if field:
+                    columns[field] = i
         
         return columns
     
     def _parse_pipe_delimited_line(self, line: str, column_map: dict) -> Optional[BankTransaction]:
         """Parse a pipe-delimited transaction line"""
-        parts = [p.strip() for p in line.split('|')]
+        if not column_map:
+            return None
         
-        if not column_map or len(parts) < 3:
+        # str.split is a single C-level pass; cells are stripped once here
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) < 3:
             return None
         
         trans_data = {
@@ -307,17 +409,17 @@ Extracted Data:""",
         # Extract data based on column mapping
         for field, idx in column_map.items():
             if idx < len(parts):
-                value = parts[idx].strip()
+                value = parts[idx]
                 if field == 'date':
                     trans_data['date'] = value
                 elif field == 'description':
                     trans_data['description'] = value
                 elif field in ['debit', 'credit', 'balance']:
                     # Parse numeric value
-                    num_str = re.sub(r'[^\d.,\-]', '', value)
+                    num_str = _NON_NUM_RE.sub('', value)
                     if num_str and num_str != '-':
                         try:
-                            trans_data[field] = abs(float(num_str.replace(',', '')))
+                            trans_data[field] = abs(float(num_str))
                         except ValueError:
                             pass
         
@@ -330,15 +432,14 @@ Extracted Data:""",
                     trans_data['credit'] = trans_data['debit']
                     trans_data['debit'] = 0
             
-            return BankTransaction(**trans_data)
+            return _make_transaction(**trans_data)
         
         return None
     
     def _parse_space_delimited_line(self, line: str) -> Optional[BankTransaction]:
         """Parse a space-delimited transaction line"""
         # Similar to v2 parser logic
-        date_pattern = r'\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}'
-        date_match = re.search(date_pattern, line)
+        date_match = _DATE_RE.search(line)
         
         if not date_match:
             return None
@@ -355,24 +456,22 @@ Extracted Data:""",
         date_end = date_match.end()
         remaining = line[date_end:].strip()
         
-        # Find all numeric values (with or without dollar signs)
-        num_pattern = r'[-+]?\$?[\d,]+\.?\d*'
-        num_matches = list(re.finditer(num_pattern, remaining))
+        # Find all numeric values (with or without dollar signs) in one scan,
+        # noting where the first one starts
+        first_num_start = -1
+        amounts = []
+        for match in _NUM_RE.finditer(remaining):
+            if first_num_start < 0:
+                first_num_start = match.start()
+            try:
+                amounts.append(float(match.group().translate(_MONEY_STRIP)))
+            except ValueError:
+                pass
         
-        if num_matches:
+        if first_num_start >= 0:
             # Description is everything before the first number
-            first_num_start = num_matches[0].start()
             trans_data['description'] = remaining[:first_num_start].strip()
             
-            # Process numeric values
-            amounts = []
-            for match in num_matches:
-                num_str = match.group().replace('$', '').replace(',', '')
-                try:
-                    amounts.append(float(num_str))
-                except ValueError:
-                    pass
-            
             # Assign amounts based on context
             desc_lower = trans_data['description'].lower()
             
@@ -393,7 +492,7 @@ Extracted Data:""",
         trans_data['description'] = trans_data['description'].strip('|').strip()
         
         if trans_data['description']:
-            return BankTransaction(**trans_data)
+            return _make_transaction(**trans_data)
         
         return None
     
@@ -402,6 +501,12 @@ Extracted Data:""",
         return self.prompt_template.format(bank_statement=bank_statement_text)
 
 
+@functools.cache
+def _get_parser() -> BankStatementParser:
+    """Shared parser instance; it holds no per-call state after construction"""
+    return BankStatementParser()
+
+
 # Keep the same helper function
 def parse_bank_statement_to_csv(ai_response: str) -> tuple[BankStatement, str]:
     """
@@ -410,7 +515,7 @@ def parse_bank_statement_to_csv(ai_response: str) -> tuple[BankStatement, str]:
     Returns:
         tuple: (BankStatement object, CSV string)
     """
-    parser = BankStatementParser()
+    parser = _get_parser()
     bank_statement = parser.parse(ai_response)
     csv_content = bank_statement.to_csv()
     
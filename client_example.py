@@ -7,15 +7,44 @@ Demonstrates various ways to interact with the server
 import requests
 import base64
 import json
+from collections import OrderedDict
 from pathlib import Path
 from typing import List, Dict, Optional, Union
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# MIME types for image data URIs, keyed by lowercase file suffix
+_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+}
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Stand-in for the image data URI while the request envelope is serialized
+_IMAGE_PLACEHOLDER = "__image_data_uri__"
+_IMAGE_PLACEHOLDER_JSON = b'"' + _IMAGE_PLACEHOLDER.encode() + b'"'
+
+# Most entries kept in the ETag response cache and the no-ETag URL list
+_ETAG_CACHE_SIZE = 32
+
 class VLMClient:
     """Simple client for interacting with VLM Server"""
     
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
         self.session = requests.Session()
+        # (url, prompt, options) -> (etag, response) for analyze_image_from_url
+        self._etag_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # URLs whose host sent no ETag; they are fetched without a HEAD
+        self._no_etag_urls: "OrderedDict[str, None]" = OrderedDict()
         
     def health_check(self) -> Dict:
         """Check server health"""
@@ -43,16 +72,32 @@ class VLMClient:
         top_p: float = 0.9
     ) -> Dict:
         """Generate response from VLM"""
+        return self._post_generate(
+            self._encode_request(messages, max_new_tokens, temperature, top_p)
+        )
+        
+    def _encode_request(
+        self,
+        messages: List[Dict],
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        top_p: float = 0.9
+    ) -> bytes:
+        """Serialize a generate request body, with orjson when available"""
         data = {
             "messages": messages,
             "max_new_tokens": max_new_tokens,
             "temperature": temperature,
             "top_p": top_p
         }
+        return orjson.dumps(data) if orjson else json.dumps(data).encode()
         
+    def _post_generate(self, body: bytes) -> Dict:
+        """Send an already serialized request body to the generate endpoint"""
         response = self.session.post(
             f"{self.base_url}/api/v1/generate",
-            json=data
+            data=body,
+            headers=_JSON_HEADERS
         )
         response.raise_for_status()
         return response.json()
@@ -63,7 +108,23 @@ class VLMClient:
         prompt: str,
         **kwargs
     ) -> str:
-        """Analyze an image from URL"""
+        """Analyze an image from URL
+        
+        When the image host sends an ETag, the answer is cached and reused
+        for as long as a HEAD request reports the same ETag. URLs whose host
+        sent no ETag are fetched again without the HEAD request.
+        """
+        key = (image_url, prompt, tuple(sorted(kwargs.items())))
+        etag = None
+        if image_url not in self._no_etag_urls:
+            etag = self._get_etag(image_url)
+            if etag is None:
+                self._remember(self._no_etag_urls, image_url, None)
+        cached = self._etag_cache.get(key)
+        if etag and cached and cached[0] == etag:
+            self._etag_cache.move_to_end(key)
+            return cached[1]
+            
         messages = [{
             "role": "user",
             "content": [
@@ -73,8 +134,28 @@ class VLMClient:
         }]
         
         result = self.generate(messages, **kwargs)
+        if etag:
+            self._remember(self._etag_cache, key, (etag, result["response"]))
         return result["response"]
         
+    @staticmethod
+    def _remember(cache: OrderedDict, key, value) -> None:
+        """Store key in cache, evicting the least recently used entries"""
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _ETAG_CACHE_SIZE:
+            cache.popitem(last=False)
+        
+    def _get_etag(self, url: str) -> Optional[str]:
+        """Return the ETag the host reports for url, if any"""
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=10)
+        except requests.RequestException:
+            return None
+        if not response.ok:
+            return None
+        return response.headers.get("ETag")
+        
     def analyze_image_from_file(
         self,
         image_path: Union[str, Path],
@@ -86,22 +167,35 @@ class VLMClient:
         
         # Read and encode image
         with open(image_path, "rb") as f:
-            image_data = base64.b64encode(f.read()).decode()
+            image_data = base64.b64encode(f.read())
             
         # Determine MIME type
-        mime_type = "image/jpeg"
-        if image_path.suffix.lower() == ".png":
-            mime_type = "image/png"
+        mime_type = _MIME_TYPES.get(image_path.suffix.lower(), "image/jpeg")
             
         messages = [{
             "role": "user",
             "content": [
-                {"type": "image", "image": f"data:{mime_type};base64,{image_data}"},
+                {"type": "image", "image": _IMAGE_PLACEHOLDER},
                 {"type": "text", "text": prompt}
             ]
         }]
         
-        result = self.generate(messages, **kwargs)
+        # Serialize the small envelope only and splice the base64 bytes in,
+        # so the large image string never goes through the JSON encoder
+        # (base64 needs no escaping). The image entry comes before the
+        # prompt, so the first placeholder is always the image's.
+        prefix, _, suffix = self._encode_request(messages, **kwargs).partition(
+            _IMAGE_PLACEHOLDER_JSON
+        )
+        body = b"".join((
+            prefix,
+            f'"data:{mime_type};base64,'.encode(),
+            image_data,
+            b'"',
+            suffix,
+        ))
+        
+        result = self._post_generate(body)
         return result["response"]
         
     def chat(
@@ -6,10 +6,13 @@ Debug script to identify the "Failed to fetch" issue
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 def debug_server_issue():
     """Debug the server connectivity and API issues"""
     base_url = "http://localhost:8000"
+    # One session so every probe reuses the same keep-alive connection
+    session = requests.Session()
     
     print("🔍 Debugging 'Failed to fetch' Issue")
     print("=" * 50)
@@ -17,7 +20,7 @@ def debug_server_issue():
     # Test 1: Basic connectivity
     print("1. Testing basic server connectivity...")
     try:
-        response = requests.get(f"{base_url}/", timeout=5)
+        response = session.get(f"{base_url}/", timeout=5)
         print(f"✅ Server responded: {response.status_code}")
         if response.status_code == 200:
             data = response.json()
@@ -34,7 +37,7 @@ def debug_server_issue():
     # Test 2: Health check
     print("\n2. Testing health endpoint...")
     try:
-        response = requests.get(f"{base_url}/health", timeout=5)
+        response = session.get(f"{base_url}/health", timeout=5)
         print(f"✅ Health check: {response.status_code}")
         if response.status_code == 200:
             data = response.json()
@@ -53,23 +56,34 @@ def debug_server_issue():
         "/reload_model"
     ]
     
-    for endpoint in endpoints_to_test:
+    def probe(endpoint):
+        """Request one endpoint, returning the response or the exception raised"""
         try:
             if endpoint == "/reload_model":
                 # POST endpoint
-                response = requests.post(f"{base_url}{endpoint}", 
-                                       json={"quantization": None}, 
-                                       timeout=5)
-            else:
-                # GET endpoint
-                response = requests.get(f"{base_url}{endpoint}", timeout=5)
-            
-            if response.status_code in [200, 404, 422]:  # 422 is validation error, means endpoint exists
-                print(f"✅ {endpoint}: {response.status_code}")
-            else:
-                print(f"❌ {endpoint}: {response.status_code} - {response.text[:100]}")
+                return session.post(f"{base_url}{endpoint}", 
+                                    json={"quantization": None}, 
+                                    timeout=5)
+            # GET endpoint; plain requests since Session isn't thread-safe
+            return requests.get(f"{base_url}{endpoint}", timeout=5)
         except Exception as e:
-            print(f"❌ {endpoint}: Error - {e}")
+            return e
+    
+    # The read-only GETs run concurrently, so a down server costs one timeout
+    # rather than one per endpoint. reload_model changes server state, so it
+    # still goes last on its own.
+    get_endpoints = [ep for ep in endpoints_to_test if ep != "/reload_model"]
+    with ThreadPoolExecutor(max_workers=len(get_endpoints)) as executor:
+        results = list(executor.map(probe, get_endpoints))
+    results.append(probe("/reload_model"))
+    
+    for endpoint, response in zip(get_endpoints + ["/reload_model"], results):
+        if isinstance(response, Exception):
+            print(f"❌ {endpoint}: Error - {response}")
+        elif response.status_code in [200, 404, 422]:  # 422 is validation error, means endpoint exists
+            print(f"✅ {endpoint}: {response.status_code}")
+        else:
+            print(f"❌ {endpoint}: {response.status_code} - {response.text[:100]}")
     
     # Test 4: Test document processing request
     print("\n4. Testing document processing request format...")
@@ -87,9 +101,9 @@ def debug_server_issue():
             "enable_safety_check": True
         }
         
-        response = requests.post(f"{base_url}/api/v1/generate", 
-                               json=test_request, 
-                               timeout=10)
+        response = session.post(f"{base_url}/api/v1/generate", 
+                              json=test_request, 
+                              timeout=10)
         print(f"✅ Generate endpoint: {response.status_code}")
         if response.status_code != 200:
             print(f"   Response: {response.text[:200]}")
@@ -0,0 +1,111 @@
+"""
+Multi-keyword substring matcher for transaction categorization
+
+Compiles every (keyword -> value) pair into a single Aho-Corasick automaton so a
+description is scanned once, no matter how many keywords are registered. Uses
+pyahocorasick when it is installed and a pure-Python automaton otherwise.
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """Map keyword groups to values and find the highest-priority hit in a text
+
+    Groups are given in priority order as (value, keywords) pairs; when several
+    keywords occur in the text, the value of the earliest group wins. This
+    mirrors a sequential `for value, keywords in groups: if any(...)` scan.
+    Matching is case-sensitive, so callers should pass lowercased text.
+    """
+
+    def __init__(self, groups: Iterable[Tuple[Any, Iterable[str]]]):
+        self.values: List[Any] = []
+        priorities: Dict[str, int] = {}
+        for priority, (value, keywords) in enumerate(groups):
+            self.values.append(value)
+            for keyword in keywords:
+                # A keyword listed under several groups belongs to the first one
+                priorities.setdefault(keyword, priority)
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, priority in priorities.items():
+                self._automaton.add_word(keyword, priority)
+            self._automaton.make_automaton()
+            self._search = self._search_native if priorities else self._search_empty
+        else:
+            self._build_trie(priorities)
+            self._search = self._search_trie
+
+    def match(self, text: str) -> Optional[Any]:
+        """Return the value of the highest-priority group found in text"""
+        priority = self._search(text)
+        return None if priority is None else self.values[priority]
+
+    def _search_empty(self, text: str) -> Optional[int]:
+        return None
+
+    def _search_native(self, text: str) -> Optional[int]:
+        best = None
+        for _, priority in self._automaton.iter(text):
+            if best is None or priority < best:
+                best = priority
+                if best == 0:
+                    break
+        return best
+
+    def _build_trie(self, priorities: Dict[str, int]):
+        """Build goto/fail/output tables for the pure-Python automaton"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[Optional[int]] = [None]
+        for keyword, priority in priorities.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._output.append(None)
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state] = priority
+
+        # Breadth-first pass to compute failure links; each state's output is
+        # folded down to the best priority reachable through its failure chain
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                inherited = self._output[fail]
+                if inherited is not None and (
+                    self._output[next_state] is None or inherited < self._output[next_state]
+                ):
+                    self._output[next_state] = inherited
+
+    def _search_trie(self, text: str) -> Optional[int]:
+        goto, fail, output = self._goto, self._fail, self._output
+        best = None
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            priority = output[state]
+            if priority is not None and (best is None or priority < best):
+                best = priority
+                if best == 0:
+                    break
+        return best
@@ -5,12 +5,36 @@ Mock VLM server for testing quantization interface without model loading
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Union
-import time
+import asyncio
+import json
 import uvicorn
 
-app = FastAPI(title="Mock VLM Server", description="For testing quantization interface")
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse rendered with orjson (FastAPI's own ORJSONResponse is deprecated)"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+def _json_body(data) -> bytes:
+    """Encode data the same way the default response class would"""
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+# The VRAM endpoints get polled by the web interface; serialize with orjson when available
+app = FastAPI(
+    title="Mock VLM Server",
+    description="For testing quantization interface",
+    default_response_class=OrjsonResponse if orjson else JSONResponse
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -39,59 +63,85 @@ class GenerateRequest(BaseModel):
     quantization: Optional[str] = None
     enable_safety_check: Optional[bool] = True
 
+# Bodies of the constant endpoints, encoded once instead of on every request
+_ROOT_BODY = _json_body({
+    "service": "Mock VLM Server",
+    "model": "Qwen/Qwen2.5-VL-7B-Instruct",
+    "status": "running",
+    "note": "Mock server for testing quantization interface",
+    "endpoints": {
+        "generate": "/api/v1/generate",
+        "health": "/health",
+        "vram_status": "/vram_status",
+        "vram_prediction": "/vram_prediction",
+        "quantization_options": "/quantization_options",
+        "clear_vram": "/clear_vram",
+        "reload_model": "/reload_model"
+    }
+})
+
+_HEALTH_BODY = _json_body({
+    "status": "healthy",
+    "model_loaded": True,
+    "device": "mock",
+    "note": "Mock server - no real model loaded"
+})
+
+_BASE_USAGE = 15.46
+_QUANTIZATION_OPTIONS_BODY = _json_body([
+    {
+        "quantization_type": "none",
+        "estimated_vram_reduction_gb": 0,
+        "estimated_vram_usage_gb": _BASE_USAGE
+    },
+    {
+        "quantization_type": "8bit", 
+        "estimated_vram_reduction_gb": _BASE_USAGE * 0.5,
+        "estimated_vram_usage_gb": _BASE_USAGE * 0.5
+    },
+    {
+        "quantization_type": "4bit",
+        "estimated_vram_reduction_gb": _BASE_USAGE * 0.75,
+        "estimated_vram_usage_gb": _BASE_USAGE * 0.25
+    }
+])
+
 @app.get("/")
 async def root():
-    return {
-        "service": "Mock VLM Server",
-        "model": "Qwen/Qwen2.5-VL-7B-Instruct",
-        "status": "running",
-        "note": "Mock server for testing quantization interface",
-        "endpoints": {
-            "generate": "/api/v1/generate",
-            "health": "/health",
-            "vram_status": "/vram_status",
-            "vram_prediction": "/vram_prediction",
-            "quantization_options": "/quantization_options",
-            "clear_vram": "/clear_vram",
-            "reload_model": "/reload_model"
-        }
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "model_loaded": True,
-        "device": "mock",
-        "note": "Mock server - no real model loaded"
-    }
+    return Response(content=_HEALTH_BODY, media_type="application/json")
 
-@app.get("/vram_status")
-async def get_vram_status():
+# Simulated quantization effects as (allocated_gb, usage_percentage), computed
+# once per level instead of on every status read
+_SIMULATED_USAGE = {
+    "none": (_BASE_USAGE, 97.06),
+    "8bit": (_BASE_USAGE * 0.5, (_BASE_USAGE * 0.5 / mock_vram_status["total_gb"]) * 100),
+    "4bit": (_BASE_USAGE * 0.25, (_BASE_USAGE * 0.25 / mock_vram_status["total_gb"]) * 100),
+}
+
+def _snapshot_and_predict(input_tokens: int = 512, output_tokens: int = 512):
+    """Refresh the mock VRAM status once and derive the usage prediction from it
+    
+    Returns a (status, prediction) tuple so callers that need both pay for a
+    single status read.
+    """
     global current_quantization, mock_vram_status
     
-    # Simulate quantization effects
-    base_usage = 15.46
-    if current_quantization == "8bit":
-        mock_vram_status["allocated_gb"] = base_usage * 0.5
-        mock_vram_status["usage_percentage"] = (mock_vram_status["allocated_gb"] / mock_vram_status["total_gb"]) * 100
-    elif current_quantization == "4bit":
-        mock_vram_status["allocated_gb"] = base_usage * 0.25
-        mock_vram_status["usage_percentage"] = (mock_vram_status["allocated_gb"] / mock_vram_status["total_gb"]) * 100
-    else:
-        mock_vram_status["allocated_gb"] = base_usage
-        mock_vram_status["usage_percentage"] = 97.06
+    # Unknown levels report like an unquantized model; str() keeps odd JSON
+    # values from reload_model hashable
+    mock_vram_status["allocated_gb"], mock_vram_status["usage_percentage"] = (
+        _SIMULATED_USAGE.get(str(current_quantization), _SIMULATED_USAGE["none"])
+    )
     
-    return mock_vram_status
-
-@app.get("/vram_prediction")
-async def predict_vram_usage(input_tokens: int = 512, output_tokens: int = 512):
     current_usage = mock_vram_status["allocated_gb"]
     additional_gb = (input_tokens + output_tokens) * 0.002 / 1024 + 0.5
     predicted_usage = current_usage + additional_gb
     predicted_percentage = (predicted_usage / mock_vram_status["total_gb"]) * 100
     
-    return {
+    prediction = {
         "current_usage_gb": current_usage,
         "predicted_usage_gb": predicted_usage,
         "current_percentage": mock_vram_status["usage_percentage"],
@@ -99,27 +149,21 @@ async def predict_vram_usage(input_tokens: int = 512, output_tokens: int = 512):
         "is_safe": predicted_percentage < 90,
         "margin_gb": mock_vram_status["total_gb"] * 0.9 - predicted_usage
     }
+    return mock_vram_status, prediction
+
+@app.get("/vram_status")
+async def get_vram_status():
+    status, _ = _snapshot_and_predict()
+    return status
+
+@app.get("/vram_prediction")
+async def predict_vram_usage(input_tokens: int = 512, output_tokens: int = 512):
+    _, prediction = _snapshot_and_predict(input_tokens, output_tokens)
+    return prediction
 
 @app.get("/quantization_options")
 async def get_quantization_options():
-    base_usage = 15.46
-    return [
-        {
-            "quantization_type": "none",
-            "estimated_vram_reduction_gb": 0,
-            "estimated_vram_usage_gb": base_usage
-        },
-        {
-            "quantization_type": "8bit", 
-            "estimated_vram_reduction_gb": base_usage * 0.5,
-            "estimated_vram_usage_gb": base_usage * 0.5
-        },
-        {
-            "quantization_type": "4bit",
-            "estimated_vram_reduction_gb": base_usage * 0.75,
-            "estimated_vram_usage_gb": base_usage * 0.25
-        }
-    ]
+    return Response(content=_QUANTIZATION_OPTIONS_BODY, media_type="application/json")
 
 @app.post("/reload_model")
 async def reload_model(request: dict = None):
@@ -141,12 +185,12 @@ async def reload_model(request: dict = None):
 
 @app.post("/api/v1/generate")
 async def generate(request: GenerateRequest):
-    # Mock processing delay
-    time.sleep(2)
+    # Mock processing delay; awaited so concurrent requests aren't serialized
+    await asyncio.sleep(2)
     
     # Check safety if enabled
     if request.enable_safety_check:
-        prediction = await predict_vram_usage(512, request.max_new_tokens)
+        _, prediction = _snapshot_and_predict(512, request.max_new_tokens)
         if not prediction["is_safe"]:
             raise HTTPException(
                 status_code=429, 
@@ -0,0 +1,53 @@
+"""
+JSON extraction and CSV formatting helpers shared by the bank statement parsers
+"""
+
+from typing import Optional
+
+
+def extract_json(text: str) -> Optional[str]:
+    """Return the first balanced {...} block in text, or None
+
+    Walks the text once tracking brace depth, ignoring braces inside JSON
+    string literals, instead of a greedy regex that spans to the last '}'.
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+
+    return None
+
+
+def csv_field(value: Optional[str]) -> str:
+    """Format a text field like csv.writer does (minimal quoting)"""
+    if not value:
+        return ''
+    if ',' in value or '"' in value or '\n' in value or '\r' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def csv_amount(value: float) -> str:
+    """Format an amount column, leaving zero amounts blank"""
+    return f"{value:.2f}" if value > 0 else ""
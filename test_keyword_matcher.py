@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test the keyword matcher's pure-Python automaton used when pyahocorasick is missing
+"""
+
+import keyword_matcher
+from keyword_matcher import KeywordMatcher
+
+GROUPS = [
+    ('Groceries', ['grocery', 'food', 'market']),
+    ('Dining', ['restaurant', 'food', 'cafe']),
+    ('Transfer', ['transfer', 'atm']),
+    ('Cash', ['atm withdrawal']),
+]
+
+def linear_match(groups, text):
+    """Reference result: the sequential scan the matcher replaces"""
+    for value, keywords in groups:
+        if any(keyword in text for keyword in keywords):
+            return value
+    return None
+
+def pure_python_matcher(groups):
+    """Build a matcher with the pyahocorasick backend disabled"""
+    saved = keyword_matcher.ahocorasick
+    keyword_matcher.ahocorasick = None
+    try:
+        return KeywordMatcher(groups)
+    finally:
+        keyword_matcher.ahocorasick = saved
+
+def test_priority_order():
+    """The earliest group wins, wherever its keyword occurs in the text"""
+    matcher = pure_python_matcher(GROUPS)
+    assert matcher.match("cafe near the market") == 'Groceries'
+    assert matcher.match("atm withdrawal") == 'Transfer'
+    assert matcher.match("restaurant") == 'Dining'
+    assert matcher.match("salary") is None
+    print("✓ Earliest group wins")
+
+def test_overlapping_keywords():
+    """A keyword listed under two groups belongs to the first; overlaps still match"""
+    matcher = pure_python_matcher(GROUPS)
+    assert matcher.match("food court") == 'Groceries'
+    # 'atm' sits inside 'atm withdrawal', and 'cafe' ends where 'food' could start
+    assert matcher.match("xatm withdrawalx") == 'Transfer'
+    assert matcher.match("cafood") == 'Groceries'
+    for text in ["", "foo", "cafe", "grocerfood", "atm", "transfer food", "restaurantmarket"]:
+        assert matcher.match(text) == linear_match(GROUPS, text), text
+    print("✓ Overlapping keywords resolve like a linear scan")
+
+def test_empty_matcher():
+    """Matchers with no groups or no keywords never match"""
+    assert pure_python_matcher([]).match("anything") is None
+    assert pure_python_matcher([('Other', [])]).match("anything") is None
+    print("✓ Empty matcher matches nothing")
+
+if __name__ == "__main__":
+    print("Keyword Matcher Test")
+    test_priority_order()
+    test_overlapping_keywords()
+    test_empty_matcher()
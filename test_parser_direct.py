@@ -133,7 +133,71 @@ def test_parser():
             print(f"✗ Parsing failed: {e}")
             logger.exception("Detailed error:")
 
+def test_prompt_prefix():
+    """Static prompt text must precede the statement so it forms a shared prefix"""
+    parser = BankStatementParser()
+    format_instructions = parser.parser.get_format_instructions()
+    
+    prompt_a = parser.create_prompt("STATEMENT A")
+    prompt_b = parser.create_prompt("STATEMENT B")
+    prefix = prompt_a[:prompt_a.index("STATEMENT A")]
+    
+    assert prompt_b.startswith(prefix)
+    assert format_instructions in prefix
+    assert prompt_a.count(format_instructions) == 1
+    print("✓ Prompt prefix is shared across statements")
+
+def test_batched_prompt():
+    """Statements are packed k per prompt, numbered from 1 within each prompt"""
+    parser = BankStatementParser()
+    statements = ["STATEMENT A", "STATEMENT B", "STATEMENT C"]
+    
+    prompts = parser.create_batched_prompt(statements, k=2)
+    assert len(prompts) == 2
+    assert "### Statement 1\nSTATEMENT A" in prompts[0]
+    assert "### Statement 2\nSTATEMENT B" in prompts[0]
+    assert "STATEMENT C" not in prompts[0]
+    assert "### Statement 1\nSTATEMENT C" in prompts[1]
+    assert len(parser.create_batched_prompt(statements, k=5)) == 1
+    
+    try:
+        parser.create_batched_prompt(statements, k=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("k < 1 should be rejected")
+    print("✓ Batched prompts hold up to k statements")
+
+def test_parse_batched():
+    """Batched responses parse from JSON, or from echoed statement sections"""
+    parser = BankStatementParser()
+    
+    json_response = """{"statements": [
+        {"transactions": [{"date": "2024-01-05", "description": "Kroger", "debit": 25.5, "balance": 100}]},
+        {"transactions": [{"date": "01/07/2024", "description": "Salary", "credit": 1000, "balance": 1100}]}
+    ]}"""
+    statements = parser.parse_batched(json_response)
+    assert len(statements) == 2
+    assert statements[0].transactions[0].date == "01/05/2024"
+    assert statements[0].total_debits == 25.5
+    assert statements[1].total_credits == 1000
+    
+    section_response = """### Statement 1
+01/05/2024  Grocery Store Purchase   $25.50   $100.00
+
+### Statement 2
+01/07/2024  Direct Deposit Salary   $1,000.00   $1,100.00
+"""
+    statements = parser.parse_batched(section_response)
+    assert len(statements) == 2
+    assert statements[0].transactions[0].description == "Grocery Store Purchase"
+    assert statements[1].transactions[0].credit == 1000
+    print("✓ Batched responses split into one statement per input")
+
 if __name__ == "__main__":
     print("Direct Bank Parser Test")
     print("Testing parser with different AI response formats...")
-    test_parser()
\ No newline at end of file
+    test_parser()
+    test_prompt_prefix()
+    test_batched_prompt()
+    test_parse_batched()
\ No newline at end of file
@@ -1,8 +1,10 @@
 import torch
 import gc
+import functools
 import asyncio
 import logging
 import base64
+import binascii
 import io
 import traceback
 import psutil
@@ -30,6 +32,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Leading magic bytes of supported image formats
+IMAGE_MAGIC_BYTES = (
+    b"\x89PNG\r\n\x1a\n",  # PNG
+    b"\xff\xd8\xff",       # JPEG
+    b"GIF8",               # GIF
+    b"RIFF",               # WEBP (RIFF container)
+    b"BM",                 # BMP
+    b"II*\x00",            # TIFF, little-endian
+    b"MM\x00*",            # TIFF, big-endian
+)
+
+def _is_base64_image(data: str) -> bool:
+    """Check whether data starts with the base64 encoding of an image header
+    
+    Only the first 16 characters are decoded, so paths and other strings are
+    rejected without decoding the whole input.
+    """
+    try:
+        head = base64.b64decode(data[:16], validate=True)
+    except (binascii.Error, ValueError):
+        return False
+    return head.startswith(IMAGE_MAGIC_BYTES)
+
+@functools.cache
+def _cuda_total_memory() -> int:
+    """Total memory of GPU 0 in bytes; fixed for the life of the process"""
+    return torch.cuda.get_device_properties(0).total_memory
+
 # Configuration
 class Config:
     # Available models with their expected VRAM usage
@@ -200,7 +230,7 @@ class VLMServer:
             
         allocated = torch.cuda.memory_allocated() / 1024**3
         reserved = torch.cuda.memory_reserved() / 1024**3
-        total = torch.cuda.get_device_properties(0).total_memory / 1024**3
+        total = _cuda_total_memory() / 1024**3
         free = total - allocated
         usage_percentage = (allocated / total) * 100
         
@@ -370,13 +400,15 @@ class VLMServer:
                 image_bytes = base64.b64decode(base64_data)
                 return Image.open(io.BytesIO(image_bytes))
                 
-            # Try as base64 without prefix
-            elif len(image_data) > 100:  # Likely base64
+            # Bare base64 is recognised by its decoded magic bytes, so paths
+            # and other strings are never run through the full decoder
+            elif _is_base64_image(image_data):
                 try:
                     image_bytes = base64.b64decode(image_data)
                     return Image.open(io.BytesIO(image_bytes))
-                except:
-                    pass
+                except (binascii.Error, ValueError, OSError) as e:
+                    # Could still be a path that happens to look like base64
+                    logger.debug(f"Base64 image decode failed, trying as path: {e}")
                     
             # Try as file path
             path = Path(image_data)